@@ -1,261 +1,444 @@
+import atexit
+import json
+import mmap
 import os
+import pickle
 import re
 import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from fastlexer import Lexer as CompiledLexer
+except ImportError:
+    CompiledLexer = None
 
 # Token types
+# Keyword-bearing patterns come before IDENTIFIER and are anchored with \b so
+# that identifiers such as `ifoo` or `notify` are not split into keywords.
+# STRING and the comment patterns in SKIP below use possessive quantifiers
+# (Python 3.11+) so malformed input cannot make them backtrack.
 TOKEN_TYPES = [
-    ('FOLDER', r'folder\s+(\w+(\.\w+)*)'),
-    ('CLASS', r'class\s+(\w+)(\s+extends\s+\w+)?'),
-    ('VARIABLE', r'variable\s+(\w+)(->\w+)?\s*=\s*("[^"]*"|\btrue\b|\bfalse\b|\b[a-zA-Z_]\w*\b)'),
-    ('FUNCTION', r'(public\s+)?function\s+(\w+)'),
-    ('RETURN', r'return\s+("[^"]*"|\btrue\b|\bfalse\b|\b[a-zA-Z_]\w*\b|\bnull\b)'),
-    ('IF', r'if'),
-    ('NOT', r'not'),
-    ('ELSE', r'but if|otherwise'),
-    ('IMPORT', r'import\s+([\w.]+)'),
+    ('FOLDER', r'\bfolder\s+(\w+(\.\w+)*)'),
+    ('CLASS', r'\bclass\s+(\w+)(\s+extends\s+\w+)?'),
+    ('VARIABLE', r'\bvariable\s+(\w+)(->\w+)?\s*=\s*("[^"]*"|\btrue\b|\bfalse\b|\b[a-zA-Z_]\w*\b)'),
+    ('FUNCTION', r'\b(public\s+)?function\s+(\w+)'),
+    ('RETURN', r'\breturn\b(\s+("[^"]*"|\btrue\b|\bfalse\b|\b[a-zA-Z_]\w*\b|\bnull\b))?'),
+    ('IF', r'\bif\b'),
+    ('NOT', r'\bnot\b'),
+    ('ELSE', r'\bbut if\b|\botherwise\b'),
+    ('IMPORT', r'\bimport\b(\s+([\w.]+))?'),
+    ('EXTENDS', r'\bextends\b'),
+    ('YEET', r'\byeet\b'),
+    ('BOOLEAN', r'\b(?:true|false)\b'),
+    ('NULL', r'\bnull\b'),
+    ('STRING', r'"(?:[^"\\]|\\.)*+"'),
+    ('ARROW', r'->'),
     ('IDENTIFIER', r'\b[a-zA-Z_]\w*\b'),
-    ('STRING', r'"(?:[^"\\]|\\.)*"'),
-    ('COMMENT', r'//.*|/\*[\s\S]*?\*/'),
     ('LPAREN', r'\('),
     ('RPAREN', r'\)'),
     ('LBRACE', r'{'),
     ('RBRACE', r'}'),
     ('SEMICOLON', r';'),
     ('DOT', r'\.'),
-    ('YEET', r'yeet'),
-    ('ARROW', r'->'),
-    ('BOOLEAN', r'true|false'),
-    ('NULL', r'null'),
 ]
 
-# Keywords
-KEYWORDS = {'if', 'not', 'but', 'otherwise', 'yeet', 'import', 'extends', 'return'}
+# Whitespace and comments produce no tokens; a whole run of them is consumed
+# by one SKIP match
+SKIP = r'(?:\s+|//.*|/\*(?:[^*]|\*(?!/))*+\*/)++'
+
+# How often each scanner alternative matched during a WOBBLE_PROFILE=1 run,
+# used to order the alternatives so the most common ones are tried first
+TOKEN_PROFILE_PATH = '.wobble_profile.json'
+TOKEN_PROFILE = Counter() if os.environ.get('WOBBLE_PROFILE') == '1' else None
+
+def load_token_profile():
+    try:
+        with open(TOKEN_PROFILE_PATH, 'r') as file:
+            counts = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(counts, dict):
+        return {}
+    return {name: count for name, count in counts.items() if isinstance(count, int)}
+
+def save_token_profile():
+    try:
+        with open(TOKEN_PROFILE_PATH, 'w') as file:
+            json.dump(dict(TOKEN_PROFILE.most_common()), file, indent=4)
+    except OSError:
+        pass
+
+if TOKEN_PROFILE is not None:
+    atexit.register(save_token_profile)
+
+def order_token_types(token_types, counts):
+    # Sort by descending frequency. IDENTIFIER would swallow keywords, so it
+    # is kept behind every keyword pattern; the other patterns, SKIP included,
+    # all start with distinct text and can be tried in any order.
+    ordered = sorted(token_types, key=lambda token_type: -counts.get(token_type[0], 0))
+    names = [name for name, _ in ordered]
+    last_keyword = max(
+        index for index, (name, pattern) in enumerate(ordered)
+        if name != 'IDENTIFIER' and pattern.startswith(r'\b')
+    )
+    identifier = names.index('IDENTIFIER')
+    if identifier < last_keyword:
+        ordered.insert(last_keyword, ordered.pop(identifier))
+    return ordered
+
+# All token patterns combined into a single scanner, compiled once at import time.
+# SKIP is discarded and MISMATCH, always last, catches anything no other
+# alternative accepts.
+MASTER = re.compile('|'.join(
+    [f'(?P<{name}>{pattern})' for name, pattern in order_token_types(TOKEN_TYPES + [('SKIP', SKIP)], load_token_profile())]
+    + [r'(?P<MISMATCH>.)']
+))
+
+# The same scanner over bytes, used when the compiled lexer reads an mmap.
+# A bytes `\s` omits the \x1c-\x1f separators that a str `\s` matches, so
+# they are added back to keep both scanners in agreement.
+MASTER_BYTES = re.compile(MASTER.pattern.replace(r'\s', r'[\s\x1c-\x1f]').encode('ascii'))
+
+# Single-character tokens, dispatched on the next character without going
+# through the scanner. None of the other patterns can start with these.
+# Each maps to a shared token tuple that the lexer yields as-is.
+SINGLE_CHAR_TOKENS = {
+    '(': ('LPAREN', '('),
+    ')': ('RPAREN', ')'),
+    '{': ('LBRACE', '{'),
+    '}': ('RBRACE', '}'),
+    ';': ('SEMICOLON', ';'),
+    '.': ('DOT', '.'),
+}
+
+# Words that begin one of the keyword-bearing patterns above; the compiled
+# lexer hands these to MASTER instead of emitting them as identifiers
+SCANNER_KEYWORDS = frozenset({
+    'folder', 'class', 'variable', 'public', 'function', 'return', 'if',
+    'not', 'but', 'otherwise', 'import', 'extends', 'yeet', 'true', 'false',
+    'null',
+})
+
+# Integer op codes for AST node types
+(
+    OP_CLASS,
+    OP_VARIABLE,
+    OP_FUNCTION,
+    OP_IF,
+    OP_RETURN,
+    OP_YEET,
+    OP_FUNCTION_CALL,
+    OP_IMPORT,
+    OP_ASSIGNMENT,
+    OP_IDENTIFIER,
+    OP_STRING,
+    OP_BOOLEAN,
+) = range(12)
+
+OPCODES = {
+    'CLASS': OP_CLASS,
+    'VARIABLE': OP_VARIABLE,
+    'FUNCTION': OP_FUNCTION,
+    'IF': OP_IF,
+    'RETURN': OP_RETURN,
+    'YEET': OP_YEET,
+    'FUNCTION_CALL': OP_FUNCTION_CALL,
+    'IMPORT': OP_IMPORT,
+    'ASSIGNMENT': OP_ASSIGNMENT,
+    'IDENTIFIER': OP_IDENTIFIER,
+    'STRING': OP_STRING,
+    'BOOLEAN': OP_BOOLEAN,
+}
 
 class Node:
+    __slots__ = ('type', 'op', 'children', 'value', 'access_modifier')
+
     def __init__(self, type, children=None, value=None, access_modifier=None):
         self.type = type
-        self.children = children if children else []
+        self.op = OPCODES[type]
+        self.children = children or ()
         self.value = value
         self.access_modifier = access_modifier
 
-def lexer(input_text):
-    tokens = []
+def lexer(source):
+    # Use the compiled scanner when it is built and the source is ASCII.
+    # source is a str, or a bytes-like buffer such as an mmap of the file.
+    # Profiling runs always use python_lexer, which counts every scanner match.
+    compiled_lexer = CompiledLexer if TOKEN_PROFILE is None else None
+    if not isinstance(source, str):
+        if compiled_lexer is not None:
+            try:
+                return compiled_lexer(source, MASTER_BYTES.match, SINGLE_CHAR_TOKENS, SCANNER_KEYWORDS)
+            except ValueError:
+                pass
+        return python_lexer(bytes(source).decode(SOURCE_ENCODING))
+    if compiled_lexer is not None and source.isascii():
+        return compiled_lexer(source, MASTER.match, SINGLE_CHAR_TOKENS, SCANNER_KEYWORDS)
+    return python_lexer(source)
+
+def python_lexer(input_text):
     position = 0
-
-    while position < len(input_text):
-        match = None
-        for token_type, pattern in TOKEN_TYPES:
-            regex = re.compile(pattern)
-            match = regex.match(input_text, position)
-            if match:
-                value = match.group(0)
-                if token_type == 'IDENTIFIER' and value in KEYWORDS:
-                    token_type = value.upper()
-                if token_type != 'COMMENT':
-                    tokens.append((token_type, value))
-                break
-
-        if not match:
+    length = len(input_text)
+    scan = MASTER.match
+    profile = TOKEN_PROFILE
+
+    while position < length:
+        token = SINGLE_CHAR_TOKENS.get(input_text[position])
+        if token is not None:
+            yield token
+            position += 1
+            continue
+
+        match = scan(input_text, position)
+        token_type = match.lastgroup
+        if token_type == 'MISMATCH':
             raise Exception('Lexer error: Unrecognized token at position ' + str(position))
-        
+        if profile is not None:
+            profile[token_type] += 1
+        if token_type != 'SKIP':
+            yield (token_type, match.group())
         position = match.end()
 
-    return tokens
-
-def parse(tokens):
-    index = 0
-
-    def peek(ahead=0):
-        nonlocal index
-        if index + ahead < len(tokens):
-            return tokens[index + ahead]
-        return None
-
-    def consume(token_type):
-        nonlocal index
-        token = peek()
-        if token and token[0] == token_type:
-            index += 1
+class TokenStream:
+    """Pulls tokens from an iterator on demand, buffering only the lookahead."""
+
+    def __init__(self, tokens):
+        self._it = iter(tokens)
+        self._buf = []
+
+    def peek(self, k=0):
+        buf = self._buf
+        while len(buf) <= k:
+            token = next(self._it, None)
+            if token is None:
+                return None
+            buf.append(token)
+        return buf[k]
+
+    def advance(self):
+        token = self.peek()
+        if token is not None:
+            del self._buf[0]
+        return token
+
+class Parser:
+    def __init__(self, tokens):
+        self.stream = TokenStream(tokens)
+        self.program_handlers = {
+            'FOLDER': self.parse_folder,
+            'CLASS': self.parse_class,
+            'VARIABLE': self.parse_variable,
+            'FUNCTION': self.parse_function,
+            'IF': self.parse_if,
+            'RETURN': self.parse_return,
+            'IMPORT': self.parse_import,
+        }
+        self.statement_handlers = {
+            'IF': self.parse_if,
+            'IDENTIFIER': self.parse_identifier_statement,
+            'YEET': self.parse_yeet,
+            'IMPORT': self.parse_import,
+            'RETURN': self.parse_return,
+        }
+        self.expression_handlers = {
+            'IDENTIFIER': self.parse_identifier,
+            'STRING': self.parse_string,
+            'BOOLEAN': self.parse_boolean,
+        }
+
+    def peek(self, ahead=0):
+        return self.stream.peek(ahead)
+
+    def peek_type(self, ahead=0):
+        token = self.stream.peek(ahead)
+        return token[0] if token is not None else None
+
+    def consume(self, token_type):
+        token = self.stream.peek()
+        if token is not None and token[0] == token_type:
+            self.stream.advance()
             return token
         raise Exception(f'Parser error: Expected {token_type}, found {token}')
 
-    def parse_import():
-        consume('IMPORT')
-        module_name = consume('IDENTIFIER')[1]
-        while peek() and peek()[0] == 'DOT':
-            consume('DOT')
-            module_name += '.' + consume('IDENTIFIER')[1]
-        consume('SEMICOLON')
+    def parse_import(self):
+        self.consume('IMPORT')
+        parts = [self.consume('IDENTIFIER')[1]]
+        while self.peek_type() == 'DOT':
+            self.consume('DOT')
+            parts.append(self.consume('IDENTIFIER')[1])
+        module_name = '.'.join(parts)
+        self.consume('SEMICOLON')
         return Node('IMPORT', value=module_name)
 
-    def parse_class():
-        consume('CLASS')
-        name = consume('IDENTIFIER')[1]
+    def parse_class(self):
+        self.consume('CLASS')
+        name = self.consume('IDENTIFIER')[1]
         extends = None
-        if peek() and peek()[0] == 'EXTENDS':
-            consume('EXTENDS')
-            extends = consume('IDENTIFIER')[1]
-        body = parse_body()
+        if self.peek_type() == 'EXTENDS':
+            self.consume('EXTENDS')
+            extends = self.consume('IDENTIFIER')[1]
+        body = self.parse_body()
         return Node('CLASS', value=name, children=body, access_modifier=None)
 
-    def parse_variable():
-        consume('VARIABLE')
-        name = consume('IDENTIFIER')[1]
+    def parse_variable(self):
+        self.consume('VARIABLE')
+        name = self.consume('IDENTIFIER')[1]
         arrow = None
-        if peek()[0] == 'ARROW':
-            consume('ARROW')
-            arrow = consume('IDENTIFIER')[1]
-        consume('EQUALS')
-        value = parse_value()
-        consume('SEMICOLON')
+        if self.peek_type() == 'ARROW':
+            self.consume('ARROW')
+            arrow = self.consume('IDENTIFIER')[1]
+        self.consume('EQUALS')
+        value = self.parse_value()
+        self.consume('SEMICOLON')
         return Node('VARIABLE', value=(name, arrow, value))
 
-    def parse_function():
+    def parse_function(self):
         is_public = False
-        if peek()[0] == 'PUBLIC':
-            consume('PUBLIC')
+        if self.peek_type() == 'PUBLIC':
+            self.consume('PUBLIC')
             is_public = True
-        consume('FUNCTION')
-        name = consume('IDENTIFIER')[1]
-        consume('LPAREN')
-        params = parse_parameters()
-        consume('RPAREN')
-        body = parse_body()
+        self.consume('FUNCTION')
+        name = self.consume('IDENTIFIER')[1]
+        self.consume('LPAREN')
+        params = self.parse_parameters()
+        self.consume('RPAREN')
+        body = self.parse_body()
         return Node('FUNCTION', value=(name, params), children=body, access_modifier='public' if is_public else None)
     
-    def parse_parameters():
+    def parse_parameters(self):
         parameters = []
-        while peek() and peek()[0] != 'RPAREN':
-            param = consume('IDENTIFIER')[1]
+        while self.peek_type() not in (None, 'RPAREN'):
+            param = self.consume('IDENTIFIER')[1]
             parameters.append(param)
-            if peek()[0] == 'COMMA':
-                consume('COMMA')
+            if self.peek_type() == 'COMMA':
+                self.consume('COMMA')
         return parameters
 
-    def parse_if():
-        consume('IF')
-        condition = parse_expression()
-        body = parse_body()
-        return Node('IF', children=[condition, body])
+    def parse_if(self):
+        self.consume('IF')
+        condition = self.parse_expression()
+        body = self.parse_body()
+        # A literal condition is folded into the node's value; anything else
+        # cannot be evaluated yet and is left as None
+        folded = condition.value if condition.op == OP_BOOLEAN else None
+        return Node('IF', children=[condition, body], value=folded)
+
+    def add_statement(self, statements, node):
+        # Splice the body of a constant-true if statement in place of it
+        if node.op == OP_IF and node.value is True:
+            statements.extend(node.children[1])
+        else:
+            statements.append(node)
 
-    def parse_body():
-        consume('LBRACE')
+    def parse_body(self):
+        self.consume('LBRACE')
         statements = []
-        while peek() and peek()[0] != 'RBRACE':
-            statement = parse_statement()
-            statements.append(statement)
-        consume('RBRACE')
+        peek = self.stream.peek
+        token = peek()
+        while token is not None and token[0] != 'RBRACE':
+            self.add_statement(statements, self.parse_statement())
+            token = peek()
+        self.consume('RBRACE')
         return statements
 
-    def parse_statement():
-        token = peek()
-        if token[0] == 'IF':
-            return parse_if()
-        elif token[0] == 'IDENTIFIER':
-            if peek(1) and peek(1)[0] == 'LPAREN':
-                return parse_function_call()
-            else:
-                return parse_assignment()
-        elif token[0] == 'YEET':
-            return parse_yeet()
-        elif token[0] == 'IMPORT':
-            return parse_import()
-        elif token[0] == 'RETURN':
-            return parse_return()
-        else:
+    def parse_statement(self):
+        token = self.peek()
+        handler = self.statement_handlers.get(token[0])
+        if handler is None:
             raise Exception(f'Parser error: Unexpected token {token}')
+        return handler()
 
-    def parse_expression():
-        token = peek()
-        if token[0] == 'IDENTIFIER':
-            return parse_identifier()
-        elif token[0] == 'STRING':
-            return parse_string()
-        elif token[0] == 'BOOLEAN':
-            return parse_boolean()
-        else:
+    def parse_identifier_statement(self):
+        if self.peek_type(1) == 'LPAREN':
+            return self.parse_function_call()
+        return self.parse_assignment()
+
+    def parse_expression(self):
+        token = self.peek()
+        handler = self.expression_handlers.get(token[0])
+        if handler is None:
             raise Exception(f'Parser error: Unexpected token {token}')
+        return handler()
 
-    def parse_identifier():
-        token = consume('IDENTIFIER')
+    def parse_identifier(self):
+        token = self.consume('IDENTIFIER')
         return Node('IDENTIFIER', value=token[1])
 
-    def parse_string():
-        token = consume('STRING')
+    def parse_string(self):
+        token = self.consume('STRING')
         return Node('STRING', value=token[1])
 
-    def parse_boolean():
-        token = consume('BOOLEAN')
-        return Node('BOOLEAN', value=token[1])
+    def parse_boolean(self):
+        token = self.consume('BOOLEAN')
+        return Node('BOOLEAN', value=token[1] == 'true')
 
-    def parse_function_call():
-        identifier = consume('IDENTIFIER')[1]
-        consume('LPAREN')
+    def parse_function_call(self):
+        identifier = self.consume('IDENTIFIER')[1]
+        self.consume('LPAREN')
         arguments = []
-        while peek() and peek()[0] != 'RPAREN':
-            arguments.append(parse_expression())
-            if peek()[0] == 'COMMA':
-                consume('COMMA')
-        consume('RPAREN')
-        consume('SEMICOLON')
+        while self.peek_type() not in (None, 'RPAREN'):
+            arguments.append(self.parse_expression())
+            if self.peek_type() == 'COMMA':
+                self.consume('COMMA')
+        self.consume('RPAREN')
+        self.consume('SEMICOLON')
         return Node('FUNCTION_CALL', value=identifier, children=arguments)
 
-    def parse_assignment():
-        variable = consume('IDENTIFIER')[1]
-        consume('EQUALS')
-        value = parse_expression()
-        consume('SEMICOLON')
+    def parse_assignment(self):
+        variable = self.consume('IDENTIFIER')[1]
+        self.consume('EQUALS')
+        value = self.parse_expression()
+        self.consume('SEMICOLON')
         return Node('ASSIGNMENT', value=(variable, value))
     
-    def parse_return():
-        consume('RETURN')
-        value = parse_expression()
-        consume('SEMICOLON')
+    def parse_return(self):
+        self.consume('RETURN')
+        value = self.parse_expression()
+        self.consume('SEMICOLON')
         return Node('RETURN', value=value)
 
-    def parse_yeet():
-        consume('YEET')
-        error = consume('STRING')[1]
-        consume('SEMICOLON')
+    def parse_yeet(self):
+        self.consume('YEET')
+        error = self.consume('STRING')[1]
+        self.consume('SEMICOLON')
         return Node('YEET', value=error)
 
-    def parse_value():
-        token = peek()
+    def parse_value(self):
+        token = self.peek()
         if token[0] == 'STRING':
-            return consume('STRING')[1]
+            return self.consume('STRING')[1]
         elif token[0] == 'BOOLEAN':
-            return token[1] == 'true'
+            return self.consume('BOOLEAN')[1] == 'true'
         elif token[0] == 'IDENTIFIER':
-            return consume('IDENTIFIER')[1]
+            return self.consume('IDENTIFIER')[1]
         elif token[0] == 'NULL':
-            consume('NULL')
+            self.consume('NULL')
             return None
         else:
             raise Exception('Parser error: Unexpected value')
 
-    ast = []
-    while peek():
+    def parse_folder(self):
+        self.consume('FOLDER')
+
+    def parse_program(self):
+        ast = []
+        peek = self.stream.peek
+        handlers = self.program_handlers
         token = peek()
-        if token[0] == 'FOLDER':
-            consume('FOLDER')
-        elif token[0] == 'CLASS':
-            ast.append(parse_class())
-        elif token[0] == 'VARIABLE':
-            ast.append(parse_variable())
-        elif token[0] == 'FUNCTION':
-            ast.append(parse_function())
-        elif token[0] == 'IF':
-            ast.append(parse_if())
-        elif token[0] == 'RETURN':
-            ast.append(parse_return())
-        elif token[0] == 'COMMENT':
-            index += 1
-        elif token[0] == 'IMPORT':
-            ast.append(parse_import())
-        else:
-            raise Exception(f'Parser error: Unexpected token {token}')
+        while token is not None:
+            handler = handlers.get(token[0])
+            if handler is None:
+                raise Exception(f'Parser error: Unexpected token {token}')
+            node = handler()
+            if node is not None:
+                self.add_statement(ast, node)
+            token = peek()
 
-    return ast
+        return ast
+
+def parse(tokens):
+    return Parser(tokens).parse_program()
 
 def semantic_analysis(ast):
     symbol_table = {}
@@ -277,7 +460,8 @@ def semantic_analysis(ast):
             symbol_table[func_name] = node
         elif node.type == "IF":
             analyze_node(node.children[0])  # condition
-            analyze_node(node.children[1])  # body
+            for child in node.children[1]:  # body
+                analyze_node(child)
         elif node.type == "RETURN":
             analyze_node(node.value)
         elif node.type == "FUNCTION_CALL":
@@ -292,47 +476,145 @@ def semantic_analysis(ast):
 
     return symbol_table
 
+# Files at least this large are mapped into memory for the compiled lexer
+# rather than read and decoded up front
+MMAP_THRESHOLD = 4096
+
+# Encoding of .us sources, used by both the text and the mmap paths
+SOURCE_ENCODING = 'utf-8'
+
 def compile_file(file_path):
-    # Compile the contents of the .us file
-    with open(file_path, 'r') as file:
-        input_text = file.read()
+    # Compile the contents of the .us file and return its AST
+    ast = None
+    if CompiledLexer is not None and os.path.getsize(file_path) >= MMAP_THRESHOLD:
+        with open(file_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as source:
+            # Text mode turns \r\n and \r into \n, which the byte scanner
+            # cannot do, so sources containing \r are read as text below
+            if source.find(b'\r') == -1:
+                tokens = lexer(source)
+                try:
+                    ast = parse(tokens)
+                finally:
+                    tokens.close()
+    if ast is None:
+        with open(file_path, 'r', encoding=SOURCE_ENCODING) as file:
+            input_text = file.read()
+        ast = parse(lexer(input_text))
 
-    tokens = lexer(input_text)
-    ast = parse(tokens)
     symbol_table = semantic_analysis(ast)
 
-    execute_ast(ast)
+    return ast
 
-def execute_ast(ast):
+# Compiled ASTs keyed by resolved file path, persisted between runs. Bump the version
+# whenever the meaning of AST values changes so stale caches are discarded;
+# the format also records Node's slots and the op code table, so a change to
+# the node layout invalidates old caches on its own.
+AST_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.wobble_ast_cache.pkl')
+AST_CACHE_VERSION = 4
+AST_CACHE_FORMAT = (AST_CACHE_VERSION, Node.__slots__, tuple(sorted(OPCODES.items())))
+_AST_CACHE = None
+
+def load_ast_cache():
+    global _AST_CACHE
+    if _AST_CACHE is None:
+        try:
+            with open(AST_CACHE_PATH, 'rb') as file:
+                data = pickle.load(file)
+        except Exception:
+            # The cache is only an optimisation; anything unreadable, from a
+            # corrupt file to a foreign pickle, is treated as empty
+            data = None
+        if isinstance(data, tuple) and len(data) == 2 and data[0] == AST_CACHE_FORMAT:
+            _AST_CACHE = data[1]
+        else:
+            _AST_CACHE = {}
+    return _AST_CACHE
+
+def save_ast_cache():
+    if _AST_CACHE is None:
+        return
+    try:
+        with open(AST_CACHE_PATH, 'wb') as file:
+            pickle.dump((AST_CACHE_FORMAT, _AST_CACHE), file)
+    except OSError:
+        pass
+
+def ast_cache_key(file_path):
+    st = os.stat(file_path)
+    return (st.st_mtime_ns, st.st_size)
+
+def compile_files(file_paths):
+    # Yield the AST of each file in file_paths, in order. Files that miss the
+    # AST cache are compiled in a process pool. A file that fails to compile
+    # raises when its turn comes, after the files before it have been
+    # yielded; every file that did compile is still cached. A profiling run
+    # compiles every file in this process so all token counts are recorded.
+    # Entries are stored under the resolved path, so the same relative path
+    # in two different projects never shares an entry
+    cache = load_ast_cache()
+    real_paths = {file_path: os.path.realpath(file_path) for file_path in file_paths}
+    misses = {}
+    for file_path in file_paths:
+        key = ast_cache_key(file_path)
+        entry = cache.get(real_paths[file_path])
+        if TOKEN_PROFILE is not None or entry is None or entry[0] != key:
+            misses[file_path] = key
+
+    futures = {}
+    if len(misses) > 1 and TOKEN_PROFILE is None:
+        with ProcessPoolExecutor() as executor:
+            for file_path in misses:
+                futures[file_path] = executor.submit(compile_file, file_path)
+
+    try:
+        for file_path in file_paths:
+            key = misses.pop(file_path, None)
+            if key is not None:
+                future = futures.pop(file_path, None)
+                ast = future.result() if future is not None else compile_file(file_path)
+                # Store the key taken before compiling, so a file edited
+                # meanwhile is recompiled on the next run rather than paired
+                # with its old AST
+                cache[real_paths[file_path]] = (key, ast)
+            yield cache[real_paths[file_path]][1]
+    finally:
+        for file_path, future in futures.items():
+            if future.exception() is None:
+                cache[real_paths[file_path]] = (misses[file_path], future.result())
+
+def execute_ast(ast, output):
+    # Append the program's output lines to the output list
+    executors = EXECUTORS
     for node in ast:
-        if node.type == "CLASS":
-            print(f"Declaring class: {node.value}")
-        elif node.type == "VARIABLE":
-            print(f"Declaring variable: {node.value[0]} of type {node.value[1]}")
-        elif node.type == "FUNCTION":
-            print(f"Declaring {'public ' if node.access_modifier == 'public' else ''}function: {node.value[0]}")
-        elif node.type == "IF":
-            execute_if_statement(node)
-        elif node.type == "RETURN":
-            execute_return_statement(node)
-        elif node.type == "YEET":
-            print(f"Error: {node.value}")
-        elif node.type == "FUNCTION_CALL":
-            execute_function_call(node)
+        executors[node.op](node, output)
+
+def execute_class_declaration(class_node, output):
+    output.append(f"Declaring class: {class_node.value}\n")
+
+def execute_variable_declaration(variable_node, output):
+    output.append(f"Declaring variable: {variable_node.value[0]} of type {variable_node.value[1]}\n")
+
+def execute_function_declaration(function_node, output):
+    output.append(f"Declaring {'public ' if function_node.access_modifier == 'public' else ''}function: {function_node.value[0]}\n")
+
+def execute_yeet_statement(yeet_node, output):
+    output.append(f"Error: {yeet_node.value}\n")
+
+def execute_nothing(node, output):
+    pass
 
-def execute_if_statement(if_node):
-    condition = if_node.children[0]
+def execute_if_statement(if_node, output):
     body = if_node.children[1]
-    if condition.value == 'true':
-        execute_ast(body)
+    if if_node.value:
+        execute_ast(body, output)
     else:
-        print("Condition not met for if statement")
+        output.append("Condition not met for if statement\n")
 
-def execute_return_statement(return_node):
+def execute_return_statement(return_node, output):
     value = return_node.value
-    print(f"Returning: {value}")
+    output.append(f"Returning: {value}\n")
 
-def execute_function_call(call_node):
+def execute_function_call(call_node, output):
     function_name = call_node.value
     arguments = call_node.children
 
@@ -340,15 +622,48 @@ def execute_function_call(call_node):
         if len(arguments) != 1:
             raise Exception('Error: say function requires exactly one argument')
         message = arguments[0].value
-        print(f"Saying: {message}")
+        output.append(f"Saying: {message}\n")
+
+# Executor for each AST op code, indexed by Node.op
+EXECUTORS = (
+    execute_class_declaration,     # OP_CLASS
+    execute_variable_declaration,  # OP_VARIABLE
+    execute_function_declaration,  # OP_FUNCTION
+    execute_if_statement,          # OP_IF
+    execute_return_statement,      # OP_RETURN
+    execute_yeet_statement,        # OP_YEET
+    execute_function_call,         # OP_FUNCTION_CALL
+    execute_nothing,               # OP_IMPORT
+    execute_nothing,               # OP_ASSIGNMENT
+    execute_nothing,               # OP_IDENTIFIER
+    execute_nothing,               # OP_STRING
+    execute_nothing,               # OP_BOOLEAN
+)
+
+def walk_source_files(directory):
+    # Yield .us files below directory, skipping hidden directories and symlinks.
+    # Like os.walk, a missing path or a file yields nothing.
+    if not os.path.isdir(directory):
+        return
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if not entry.name.startswith('.'):
+                    yield from walk_source_files(entry.path)
+            elif entry.name.endswith('.us') and entry.is_file(follow_symlinks=False):
+                yield entry.path
 
 def compile_files_in_directory(directory):
     # Traverse the directory structure and compile .us files
-    for root, _, files in os.walk(directory):
-        for file in files:
-            if file.endswith('.us'):
-                file_path = os.path.join(root, file)
-                compile_file(file_path)
+    # Sorted so output follows file-name order on every filesystem
+    file_paths = sorted(walk_source_files(directory))
+    output = []
+    try:
+        for ast in compile_files(file_paths):
+            execute_ast(ast, output)
+    finally:
+        sys.stdout.write(''.join(output))
+        save_ast_cache()
 
 def main():
     if len(sys.argv) != 2:
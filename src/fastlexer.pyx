@@ -0,0 +1,142 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+#
+# Compiled fast path for compiler.lexer.
+# Build in place with `cythonize -i src/fastlexer.pyx`; without the built
+# extension compiler.py keeps using its pure-Python lexer.
+#
+# Whitespace, punctuation, plain identifiers and string literals are scanned
+# here byte by byte. Everything else (keyword-led tokens, comments, arrows,
+# malformed input) is handed to the compiler's combined scanner regex, so the
+# token stream is identical to the pure-Python lexer. Only ASCII sources are
+# accepted: either a str, whose 1-byte buffer is read directly, or a bytes-like
+# buffer such as an mmap of the source file, paired with a bytes scanner.
+
+from cpython.unicode cimport PyUnicode_DecodeASCII
+
+cdef extern from "Python.h":
+    const unsigned char *PyUnicode_1BYTE_DATA(object o)
+    bint PyUnicode_IS_ASCII(object o)
+
+# Character class tables indexed by byte, filled in once at import
+cdef unsigned char IS_SPACE[256]
+cdef unsigned char ID_START[256]
+cdef unsigned char ID_CONT[256]
+
+cdef void init_tables():
+    cdef int c
+    for c in range(256):
+        # Same set as the `\s` class of a str pattern, restricted to ASCII
+        IS_SPACE[c] = c == 32 or 9 <= c <= 13 or 28 <= c <= 31
+        ID_START[c] = (97 <= c <= 122) or (65 <= c <= 90) or c == 95
+        ID_CONT[c] = ID_START[c] or (48 <= c <= 57)
+
+init_tables()
+
+cdef class Lexer:
+    cdef object source
+    cdef const unsigned char[:] view
+    cdef const unsigned char *buf
+    cdef bint is_text
+    cdef Py_ssize_t pos, n
+    cdef object scan
+    cdef list punct
+    cdef frozenset keywords
+
+    def __init__(self, source, scan, dict single_char_tokens, keywords):
+        cdef Py_ssize_t i
+        if isinstance(source, str):
+            if not PyUnicode_IS_ASCII(source):
+                raise ValueError('Lexer only accepts ASCII source text')
+            self.is_text = True
+            self.buf = PyUnicode_1BYTE_DATA(source)
+            self.n = len(<str>source)
+        else:
+            self.view = source
+            self.n = self.view.shape[0]
+            self.buf = &self.view[0] if self.n else NULL
+            for i in range(self.n):
+                if self.buf[i] >= 128:
+                    self.close()
+                    raise ValueError('Lexer only accepts ASCII source text')
+        self.source = source
+        self.pos = 0
+        self.scan = scan
+        self.punct = [None] * 128
+        for char, token in single_char_tokens.items():
+            self.punct[ord(char)] = token
+        self.keywords = frozenset(keywords)
+
+    def __iter__(self):
+        return self
+
+    def close(self):
+        # Drop the source so a buffer such as an mmap can be closed
+        self.source = None
+        self.view = None
+        self.buf = NULL
+        self.pos = self.n = 0
+
+    def __next__(self):
+        cdef const unsigned char *buf = self.buf
+        cdef Py_ssize_t n = self.n
+        cdef Py_ssize_t pos = self.pos
+        cdef Py_ssize_t start
+        cdef unsigned char c
+        cdef object word
+        cdef object token
+
+        while pos < n:
+            c = buf[pos]
+
+            if IS_SPACE[c]:
+                pos += 1
+                continue
+
+            token = self.punct[c]
+            if token is not None:
+                self.pos = pos + 1
+                return token
+
+            if ID_START[c] and (pos == 0 or not ID_CONT[buf[pos - 1]]):
+                start = pos
+                pos += 1
+                while pos < n and ID_CONT[buf[pos]]:
+                    pos += 1
+                word = PyUnicode_DecodeASCII(<const char *>buf + start, pos - start, NULL)
+                if word not in self.keywords:
+                    self.pos = pos
+                    return ('IDENTIFIER', word)
+                pos = start
+            elif c == 34:  # '"'
+                start = pos
+                pos += 1
+                while pos < n:
+                    c = buf[pos]
+                    if c == 34:
+                        break
+                    if c == 92:  # '\\' escapes anything but a newline
+                        if pos + 1 >= n or buf[pos + 1] == 10:
+                            break
+                        pos += 2
+                    else:
+                        pos += 1
+                if pos < n and buf[pos] == 34:
+                    self.pos = pos + 1
+                    return ('STRING', PyUnicode_DecodeASCII(<const char *>buf + start, pos + 1 - start, NULL))
+                pos = start
+
+            # Anything not handled above goes through the combined scanner
+            match = self.scan(self.source, pos)
+            token_type = match.lastgroup
+            if token_type == 'MISMATCH':
+                raise Exception('Lexer error: Unrecognized token at position ' + str(pos))
+            pos = match.end()
+            if token_type != 'SKIP':
+                self.pos = pos
+                value = match.group()
+                if not self.is_text:
+                    value = value.decode('ascii')
+                return (token_type, value)
+
+        self.pos = pos
+        raise StopIteration
\ No newline at end of file
@@ -0,0 +1,234 @@
+import os
+import re
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import compiler
+
+def dump(node):
+    # Plain-data view of an AST so two trees can be compared with ==
+    if isinstance(node, compiler.Node):
+        return (node.type, dump(node.value), dump(node.children), node.access_modifier)
+    if isinstance(node, (list, tuple)):
+        return [dump(child) for child in node]
+    return node
+
+@unittest.skipUnless(compiler.CompiledLexer, 'fastlexer extension not built')
+class CompileFileSizeTest(unittest.TestCase):
+    # Files above MMAP_THRESHOLD take the mmap path when the compiled lexer
+    # is built; they must compile exactly like small files
+
+    PROGRAM = 'class A B {\n    yeet "line1\nline2 é";\n}\n'
+
+    def compile_both(self, newline, program=PROGRAM):
+        padding = '// ' + 'x' * compiler.MMAP_THRESHOLD + '\n'
+        with tempfile.TemporaryDirectory() as directory:
+            small = os.path.join(directory, 'small.us')
+            large = os.path.join(directory, 'large.us')
+            for file_path, text in ((small, program), (large, padding + program)):
+                with open(file_path, 'w', encoding='utf-8', newline=newline) as file:
+                    file.write(text)
+            self.assertLess(os.path.getsize(small), compiler.MMAP_THRESHOLD)
+            self.assertGreaterEqual(os.path.getsize(large), compiler.MMAP_THRESHOLD)
+            return dump(compiler.compile_file(small)), dump(compiler.compile_file(large))
+
+    def test_lf_sources_match(self):
+        small, large = self.compile_both('\n')
+        self.assertEqual(small, large)
+
+    def test_crlf_sources_match(self):
+        small, large = self.compile_both('\r\n')
+        self.assertEqual(small, large)
+        self.assertEqual(small[0][2][0][1], '"line1\nline2 é"')
+
+    def test_ascii_sources_match(self):
+        small, large = self.compile_both('\n', self.PROGRAM.replace(' é', ''))
+        self.assertEqual(small, large)
+
+def collect(tokens):
+    # Tokens up to the first error, and that error's message
+    result = []
+    try:
+        for token in tokens:
+            result.append(token)
+    except Exception as error:
+        return result, str(error)
+    return result, None
+
+@unittest.skipUnless(compiler.CompiledLexer, 'fastlexer extension not built')
+class CompiledLexerTest(unittest.TestCase):
+    # The compiled lexer, over text or bytes, must agree with python_lexer
+    # token for token, including where it stops on malformed input
+
+    SOURCES = [
+        'ifoo if iffy notify not nothing yeetx yeet truex true falsey false',
+        'nullable null returned return x return "a" return null importer',
+        'but if butter otherwise otherwiser extends extender folder a.b.c',
+        'class A extends B { public function f() { variable v->T = x; } }',
+        'variable s = "text"; variable t = true; say(false);',
+        '"a\\"b" "\\\\" "esc \\n tab\\t" "\\"" x',
+        '"unterminated',
+        '"escaped newline \\\n" x',
+        '"trailing backslash \\',
+        'x /* unterminated comment',
+        'x /* comment */ y // line comment\nz',
+        'a\x1cb\x1dc\x1ed\x1ff \t\r\n\x0b\x0c g',
+        'x -> y - z',
+        'x @ y',
+        '_a1 a_1 9a',
+        '',
+    ]
+
+    def lex_all(self, source):
+        return (
+            collect(compiler.python_lexer(source)),
+            collect(compiler.CompiledLexer(source, compiler.MASTER.match, compiler.SINGLE_CHAR_TOKENS, compiler.SCANNER_KEYWORDS)),
+            collect(compiler.CompiledLexer(source.encode('ascii'), compiler.MASTER_BYTES.match, compiler.SINGLE_CHAR_TOKENS, compiler.SCANNER_KEYWORDS)),
+        )
+
+    def test_lexers_agree(self):
+        for source in self.SOURCES:
+            with self.subTest(source=source):
+                expected, text, data = self.lex_all(source)
+                self.assertEqual(text, expected)
+                self.assertEqual(data, expected)
+
+    def test_keyword_prefixes_are_identifiers(self):
+        expected, _, _ = self.lex_all(self.SOURCES[0])
+        self.assertEqual(expected[0][:4], [('IDENTIFIER', 'ifoo'), ('IF', 'if'), ('IDENTIFIER', 'iffy'), ('IDENTIFIER', 'notify')])
+
+    def test_non_ascii_is_rejected(self):
+        with self.assertRaises(ValueError):
+            compiler.CompiledLexer('"é"', compiler.MASTER.match, compiler.SINGLE_CHAR_TOKENS, compiler.SCANNER_KEYWORDS)
+        with self.assertRaises(ValueError):
+            compiler.CompiledLexer('"é"'.encode('utf-8'), compiler.MASTER_BYTES.match, compiler.SINGLE_CHAR_TOKENS, compiler.SCANNER_KEYWORDS)
+
+class CompileFilesTest(unittest.TestCase):
+    # compile_files and compile_files_in_directory against a private cache file
+
+    def setUp(self):
+        temporary = tempfile.TemporaryDirectory()
+        self.addCleanup(temporary.cleanup)
+        self.directory = temporary.name
+        patcher = mock.patch.object(compiler, 'AST_CACHE_PATH', os.path.join(self.directory, 'cache.pkl'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        compiler._AST_CACHE = None
+        self.addCleanup(setattr, compiler, '_AST_CACHE', None)
+
+    def write(self, name, text):
+        file_path = os.path.join(self.directory, name)
+        with open(file_path, 'w', encoding='utf-8') as file:
+            file.write(text)
+        return file_path
+
+    def saved_cache(self):
+        # The cache as the next run would load it from disk
+        compiler._AST_CACHE = None
+        return compiler.load_ast_cache()
+
+    def run_directory(self):
+        output = StringIO()
+        with redirect_stdout(output):
+            try:
+                compiler.compile_files_in_directory(self.directory)
+            except Exception as error:
+                return output.getvalue(), error
+        return output.getvalue(), None
+
+    def test_parse_failure_keeps_earlier_output_and_cache(self):
+        first = self.write('a.us', 'class X A {}')
+        self.write('b.us', 'class X @ {}')
+        last = self.write('c.us', 'class X C {}')
+        output, error = self.run_directory()
+        self.assertIn('Lexer error', str(error))
+        self.assertEqual(output, 'Declaring class: A\n')
+        self.assertEqual(sorted(self.saved_cache()), sorted([os.path.realpath(first), os.path.realpath(last)]))
+
+    def test_execution_failure_saves_cache(self):
+        file_path = self.write('a.us', 'class X A {}')
+        with mock.patch.object(compiler, 'execute_ast', side_effect=Exception('boom')):
+            output, error = self.run_directory()
+        self.assertEqual(str(error), 'boom')
+        self.assertIn(os.path.realpath(file_path), self.saved_cache())
+
+    def test_file_edited_during_compile_is_recompiled(self):
+        file_path = self.write('a.us', 'class X Old {}')
+        compile_file = compiler.compile_file
+
+        def edit_then_compile(path):
+            ast = compile_file(path)
+            self.write('a.us', 'class X Newer {}')
+            return ast
+
+        with mock.patch.object(compiler, 'compile_file', edit_then_compile):
+            self.assertEqual([ast[0].value for ast in compiler.compile_files([file_path])], ['Old'])
+        self.assertEqual([ast[0].value for ast in compiler.compile_files([file_path])], ['Newer'])
+
+class KeywordBoundaryTest(unittest.TestCase):
+    # Keywords only match as whole words
+
+    SOURCE = 'ifoo notify nothing butter otherwiser yeetx truex falsey nullable returned importer extender folders x classy y'
+
+    def test_keyword_prefixes_are_identifiers(self):
+        for tokens in (compiler.python_lexer(self.SOURCE), compiler.lexer(self.SOURCE)):
+            self.assertEqual(list(tokens), [('IDENTIFIER', word) for word in self.SOURCE.split()])
+
+    def test_keywords_still_match(self):
+        self.assertEqual(list(compiler.python_lexer('if ifoo not notify')), [('IF', 'if'), ('IDENTIFIER', 'ifoo'), ('NOT', 'not'), ('IDENTIFIER', 'notify')])
+
+class TokenOrderTest(unittest.TestCase):
+    # A profile may reorder the scanner, but never let IDENTIFIER claim a keyword
+
+    COUNTS = {'IDENTIFIER': 100, 'SKIP': 90, 'STRING': 50, 'LPAREN': 40}
+
+    def test_identifier_follows_keywords(self):
+        ordered = compiler.order_token_types(compiler.TOKEN_TYPES + [('SKIP', compiler.SKIP)], self.COUNTS)
+        names = [name for name, _ in ordered]
+        keywords = [index for index, (name, pattern) in enumerate(ordered) if name != 'IDENTIFIER' and pattern.startswith(r'\b')]
+        self.assertEqual(names.index('IDENTIFIER'), max(keywords) + 1)
+        self.assertEqual(names[:3], ['SKIP', 'STRING', 'LPAREN'])
+        self.assertEqual(sorted(names), sorted(name for name, _ in compiler.TOKEN_TYPES + [('SKIP', compiler.SKIP)]))
+
+    def test_profiled_scanner_keeps_keywords(self):
+        ordered = compiler.order_token_types(compiler.TOKEN_TYPES + [('SKIP', compiler.SKIP)], self.COUNTS)
+        master = re.compile('|'.join([f'(?P<{name}>{pattern})' for name, pattern in ordered] + [r'(?P<MISMATCH>.)']))
+        with mock.patch.object(compiler, 'MASTER', master):
+            tokens = list(compiler.python_lexer('ifoo if nothing not x'))
+        self.assertEqual(tokens, [('IDENTIFIER', 'ifoo'), ('IF', 'if'), ('IDENTIFIER', 'nothing'), ('NOT', 'not'), ('IDENTIFIER', 'x')])
+
+def run_source(source):
+    # Compile and execute source text, returning the output lines
+    ast = compiler.parse(compiler.lexer(source))
+    compiler.semantic_analysis(ast)
+    output = []
+    compiler.execute_ast(ast, output)
+    return output
+
+class IfStatementTest(unittest.TestCase):
+    def test_false_condition_is_not_met(self):
+        self.assertEqual(run_source('if false { yeet "no"; }'), ['Condition not met for if statement\n'])
+
+    def test_identifier_condition_is_not_met(self):
+        self.assertEqual(run_source('if x { yeet "no"; }'), ['Condition not met for if statement\n'])
+
+    def test_true_condition_is_inlined(self):
+        ast = compiler.parse(compiler.lexer('if true { yeet "yes"; }'))
+        self.assertEqual([node.type for node in ast], ['YEET'])
+        self.assertEqual(run_source('if true { yeet "yes"; }'), ['Error: "yes"\n'])
+
+    def test_boolean_values_are_bools(self):
+        ast = compiler.parse(compiler.lexer('if x { say(true); say(false); }'))
+        arguments = [call.children[0].value for call in ast[0].children[1]]
+        self.assertEqual(arguments, [True, False])
+        self.assertEqual(ast[0].children[0].value, 'x')
+        self.assertIs(compiler.parse(compiler.lexer('if false { }'))[0].value, False)
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file